@@ -0,0 +1,496 @@
+import hashlib
+import os
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from anki.utils import ids2str
+from aqt import gui_hooks, mw
+from aqt.operations import on_op_finished
+from aqt.qt import *
+from aqt.utils import showInfo
+
+# Anki bundles orjson; fall back to the stdlib json module if it's unavailable
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+    _json_loads = json.loads
+
+COMBINE_ALL_OPTION = "Combine All Keys"
+FIELD_SEPARATOR = "\x1f"
+DEDUP_KEY_DIGEST_SIZE = 16
+TAG_BATCH_SIZE = 1000
+TAG_BATCHING_THRESHOLD = 10_000
+NOTE_HAS_CARDS_SQL = "exists (select 1 from cards where cards.nid = notes.id)"
+DEFAULT_TAG_NAME = "duplicate-card"
+CONFIG_FILE_NAME = "config.json"
+DEFAULT_CONFIG = {
+    "ankiFilter": "",
+    "dedupKey": COMBINE_ALL_OPTION,
+    "tagName": DEFAULT_TAG_NAME,
+}
+
+# Config shared across window instances; populated on first load, updated on save
+_config_cache: Optional[Dict] = None
+_addon_dir_ready = False
+
+
+class DuplicateTaggerWindow(QWidget):
+    """Main window for configuring duplicate card tagging."""
+
+    COMBINE_ALL = COMBINE_ALL_OPTION
+
+    def keyPressEvent(self, event):
+        """Handle keyboard shortcuts."""
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            self._on_ok()
+        elif event.key() == Qt.Key.Key_Escape:
+            self.close()
+        elif event.key() == Qt.Key.Key_W and event.modifiers() == Qt.KeyboardModifier.ControlModifier:
+            self.close()
+        else:
+            super().keyPressEvent(event)
+
+    def closeEvent(self, event):
+        """Stop listening for collection changes once the window closes."""
+        gui_hooks.operation_did_execute.remove(self._on_operation_did_execute)
+        super().closeEvent(event)
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Deduplicator")
+
+        # State
+        config = self._load_config()
+        self.anki_filter = config.get('ankiFilter', '')
+        self.selected_key = config.get('dedupKey', self.COMBINE_ALL)
+        self.tag_name = config.get('tagName', DEFAULT_TAG_NAME)
+        self.field_names: Set[str] = set()
+        self._last_filter_resolved: Optional[str] = None
+        self._field_names_cache: Dict[str, Set[str]] = {}
+        self._key_index_by_mid: Dict[int, Optional[int]] = {}
+        self._cached_note_ids: Optional[Tuple[str, List[int]]] = None
+
+        # UI components
+        self.filter_input = QLineEdit()
+        self.key_combo = QComboBox()
+        self.tag_input = QLineEdit()
+        self.ok_btn = None
+
+        self._setup_ui()
+        self._connect_signals()
+        self._initialize_values()
+
+        # The window is non-modal, so notes can change in Anki while it stays open
+        gui_hooks.operation_did_execute.append(self._on_operation_did_execute)
+
+    def _get_config_path(self) -> str:
+        """Get the path to config.json in the Anki addons directory."""
+        global _addon_dir_ready
+        addon_dir = os.path.join(mw.pm.addonFolder(), 'deduplicator_anki')
+        if not _addon_dir_ready:
+            os.makedirs(addon_dir, exist_ok=True)
+            _addon_dir_ready = True
+        return os.path.join(addon_dir, CONFIG_FILE_NAME)
+
+    def _load_config(self) -> Dict:
+        """Load configuration from config.json. Includes fallback for older keys."""
+        global _config_cache
+        if _config_cache is not None:
+            return _config_cache.copy()
+
+        config_path = self._get_config_path()
+        config = DEFAULT_CONFIG.copy()
+
+        try:
+            if os.path.exists(config_path):
+                with open(config_path, 'rb') as f:
+                    loaded = _json_loads(f.read())
+                    if isinstance(loaded, dict):
+                        config.update({k: v for k, v in loaded.items() if k in config})
+                        # Backwards compatibility with older config keys
+                        if 'selectedKey' in loaded and 'dedupKey' not in loaded:
+                            config['dedupKey'] = loaded['selectedKey']
+                        if 'selectedMethod' in loaded and 'tagName' not in loaded:
+                            config['tagName'] = DEFAULT_TAG_NAME
+        except Exception as e:
+            showInfo(f'Error loading config: {e}')
+
+        # Guard empty or invalid values
+        if not config.get('tagName'):
+            config['tagName'] = DEFAULT_TAG_NAME
+        if not config.get('dedupKey'):
+            config['dedupKey'] = self.COMBINE_ALL
+
+        _config_cache = config
+        return config.copy()
+
+    def _save_config(self) -> None:
+        """Save current configuration to config.json, skipping writes that change nothing."""
+        global _config_cache
+        config = {
+            'ankiFilter': self.anki_filter,
+            'dedupKey': self.selected_key,
+            'tagName': self.tag_name or DEFAULT_TAG_NAME,
+        }
+        if config == _config_cache:
+            return
+
+        config_path = self._get_config_path()
+        tmp_path = config_path + '.tmp'
+        try:
+            # Write to a temp file and swap it in so a crash never leaves a half-written config
+            with open(tmp_path, 'wb') as f:
+                f.write(_json_dumps(config))
+            os.replace(tmp_path, config_path)
+        except Exception as e:
+            try:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            except OSError:
+                pass
+            showInfo(f'Error saving config: {e}')
+            return
+
+        _config_cache = config
+
+    def _setup_ui(self) -> None:
+        """Set up the user interface layout."""
+        layout = QVBoxLayout()
+
+        # Form layout for inputs
+        form_layout = QFormLayout()
+
+        # Set minimum width for all input fields
+        min_width = 300
+
+        # Filter input
+        self.filter_input.setPlaceholderText('e.g., deck:MyDeck')
+        self.filter_input.setMinimumWidth(min_width)
+        form_layout.addRow("Filter:", self.filter_input)
+
+        # Key selection
+        self.key_combo.setMinimumWidth(min_width)
+        self.key_combo.addItem(self.COMBINE_ALL)
+        form_layout.addRow("Key field:", self.key_combo)
+
+        # Tag name
+        self.tag_input.setPlaceholderText(DEFAULT_TAG_NAME)
+        self.tag_input.setMinimumWidth(min_width)
+        form_layout.addRow("Tag:", self.tag_input)
+
+        layout.addLayout(form_layout)
+
+        # Button layout
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+
+        self.ok_btn = QPushButton("OK")
+        self.ok_btn.clicked.connect(self._on_ok)
+        self.ok_btn.setDefault(True)
+        self.ok_btn.setAutoDefault(True)
+        button_layout.addWidget(self.ok_btn)
+
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.close)
+        button_layout.addWidget(cancel_btn)
+
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+    def _connect_signals(self) -> None:
+        """Connect UI signals to handlers."""
+        self.filter_input.textChanged.connect(self._on_filter_changed)
+        self.filter_input.editingFinished.connect(self._on_filter_finished)
+        self.key_combo.currentIndexChanged.connect(self._on_key_changed_index)
+        self.tag_input.editingFinished.connect(self._on_tag_changed)
+        self.tag_input.textChanged.connect(self._on_tag_changed_live)
+
+    def _initialize_values(self) -> None:
+        """Initialize UI with saved values."""
+        # Block signals during initialization to prevent premature saves
+        self.filter_input.blockSignals(True)
+        self.key_combo.blockSignals(True)
+        self.tag_input.blockSignals(True)
+
+        self.filter_input.setText(self.anki_filter)
+
+        # Update field list and restore selected key
+        if self.anki_filter:
+            self._update_field_list()
+        else:
+            # Even without a filter, ensure the key combo has the default option
+            if self.key_combo.count() == 0:
+                self.key_combo.addItem(self.COMBINE_ALL)
+            self.key_combo.setCurrentText(self.COMBINE_ALL)
+
+        # Restore tag name
+        self.tag_input.setText(self.tag_name)
+
+        # Re-enable signals
+        self.filter_input.blockSignals(False)
+        self.key_combo.blockSignals(False)
+        self.tag_input.blockSignals(False)
+
+        # Focus the filter field to allow quick keyboard workflow
+        self.filter_input.setFocus()
+
+    def _on_operation_did_execute(self, changes, handler) -> None:
+        """Drop cached search results once the collection changes, so they are resolved again."""
+        self._cached_note_ids = None
+        self._field_names_cache.clear()
+        self._last_filter_resolved = None
+
+    def _on_filter_changed(self, text: str) -> None:
+        """Handle filter text changes."""
+        self.anki_filter = text
+        self._cached_note_ids = None
+
+    def _on_filter_finished(self) -> None:
+        """Handle filter editing finished."""
+        self._save_config()
+        self._update_field_list()
+
+    def _on_key_changed_index(self, index: int) -> None:
+        """Handle key selection change by index."""
+        if index >= 0:
+            self.selected_key = self.key_combo.currentText()
+            self._save_config()
+
+    def _on_tag_changed_live(self, text: str) -> None:
+        """Update tag name as the user types."""
+        self.tag_name = text.strip()
+
+    def _on_tag_changed(self) -> None:
+        """Persist tag name changes."""
+        self.tag_name = self.tag_name or DEFAULT_TAG_NAME
+        self.tag_input.setText(self.tag_name)
+        self._save_config()
+
+    def _update_field_list(self) -> None:
+        """Update the field list based on current filter."""
+        if not self.anki_filter:
+            return
+
+        # Focus loss re-fires editingFinished; skip work if the filter hasn't changed
+        if self.anki_filter == self._last_filter_resolved:
+            return
+
+        cached = self._field_names_cache.get(self.anki_filter)
+        if cached is not None:
+            self.field_names = cached
+        else:
+            try:
+                note_ids = mw.col.findNotes(self.anki_filter)
+            except Exception as e:
+                showInfo(f'Invalid Anki filter syntax: {e}')
+                return
+
+            self._cached_note_ids = (self.anki_filter, note_ids)
+            self.field_names = self._find_field_names(note_ids)
+            self._field_names_cache[self.anki_filter] = self.field_names
+
+        self._last_filter_resolved = self.anki_filter
+        self._populate_key_combo()
+
+    def _find_field_names(self, note_ids: List[int]) -> Set[str]:
+        """Return the field names used by the given notes."""
+        field_names: Set[str] = set()
+        field_names_method = getattr(mw.col, "field_names_for_note_ids", None)
+
+        if callable(field_names_method):
+            field_names.update(field_names_method(note_ids))
+        else:
+            # Fallback for older Anki versions: read field names from the note types in use
+            mids = mw.col.db.list(f"select distinct mid from notes where id in {ids2str(note_ids)}")
+            for mid in mids:
+                for fld in mw.col.models.get(mid)['flds']:
+                    field_names.add(fld['name'])
+
+        return field_names
+
+    def _populate_key_combo(self) -> None:
+        """Fill the key combo with the current field names and restore the selection."""
+        # Block signals to prevent triggering save during update
+        self.key_combo.blockSignals(True)
+        new_items = [self.COMBINE_ALL] + sorted(self.field_names)
+        current_items = [self.key_combo.itemText(i) for i in range(self.key_combo.count())]
+        # Only rebuild the combo when its contents would actually change
+        if current_items != new_items:
+            self.key_combo.clear()
+            self.key_combo.addItems(new_items)
+
+        # Restore selection if valid
+        if self.selected_key in self.field_names or self.selected_key == self.COMBINE_ALL:
+            self.key_combo.setCurrentText(self.selected_key)
+        else:
+            self.selected_key = self.COMBINE_ALL
+            self.key_combo.setCurrentText(self.COMBINE_ALL)
+
+        self.key_combo.blockSignals(False)
+
+    def _on_ok(self) -> None:
+        """Handle OK button click - tag duplicates and close."""
+        if not self.anki_filter:
+            showInfo('No Anki filter specified')
+            return
+
+        tagged = self._tag_duplicates()
+        if tagged is not None:
+            showInfo(tagged)
+            self.close()
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        """Return a compact fixed-size digest of the given text."""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=DEDUP_KEY_DIGEST_SIZE).digest()
+
+    def _resolve_key_index(self, mid: int) -> Optional[int]:
+        """Return the selected key's field index for a note type, memoized per mid."""
+        if mid not in self._key_index_by_mid:
+            flds = mw.col.models.get(mid)['flds']
+            self._key_index_by_mid[mid] = next(
+                (i for i, fld in enumerate(flds) if fld['name'] == self.selected_key), None
+            )
+        return self._key_index_by_mid[mid]
+
+    def _get_dedup_key(self, flds: str, mid: int) -> bytes:
+        """Get the deduplication key from a note's raw joined fields and note type id."""
+        idx = self._key_index_by_mid[mid]
+        # Stop scanning at the selected field instead of splitting every field
+        if idx == 0:
+            value = flds.partition(FIELD_SEPARATOR)[0]
+        else:
+            value = flds.split(FIELD_SEPARATOR, idx + 1)[idx]
+        return self._digest(value)
+
+    def _collect_note_ids(self) -> Optional[List[int]]:
+        """Return note ids for the configured filter, reusing the last search if it matches."""
+        if self._cached_note_ids is not None and self._cached_note_ids[0] == self.anki_filter:
+            return self._cached_note_ids[1]
+
+        try:
+            return mw.col.findNotes(self.anki_filter)
+        except Exception as e:
+            showInfo(f'Error executing filter: {e}')
+            return None
+
+    def _tag_duplicates(self) -> Optional[str]:
+        """Find and tag all duplicate notes."""
+        note_ids = self._collect_note_ids()
+        if note_ids is None:
+            return None
+
+        # The selected key is fixed for this run, so resolve its index once per note type
+        self._key_index_by_mid.clear()
+
+        try:
+            duplicates = self._group_duplicates(note_ids)
+        except Exception as e:
+            showInfo(f'Error while locating duplicates: {e}')
+            return None
+
+        tag_to_apply = self.tag_name or DEFAULT_TAG_NAME
+        newly_tagged, already_tagged, undo_steps = self._apply_tag_to_duplicates(
+            duplicates, tag_to_apply
+        )
+
+        message = (
+            f"Total: {newly_tagged} notes newly tagged as '{tag_to_apply}', "
+            f"{already_tagged} already tagged"
+        )
+        if undo_steps > 1:
+            message += f"\nTagged in {undo_steps} batches; reverting takes {undo_steps} Undo steps"
+        return message
+
+    def _group_duplicates(self, note_ids: List[int]) -> List[List[int]]:
+        """Return groups of duplicate note ids, each holding more than one note."""
+        ids = ids2str(note_ids)
+        if self.selected_key == self.COMBINE_ALL:
+            return self._group_duplicates_by_all_fields(ids)
+
+        # Only fetch notes whose note type actually has the selected field
+        mids = mw.col.db.list(f"select distinct mid from notes where id in {ids}")
+        keyed_mids = [mid for mid in mids if self._resolve_key_index(mid) is not None]
+        if not keyed_mids:
+            return []
+
+        # Fetch raw rows in bulk instead of hydrating a Note object per id
+        rows = mw.col.db.all(
+            f"select id, flds, mid from notes where id in {ids} and mid in {ids2str(keyed_mids)}"
+            f" and {NOTE_HAS_CARDS_SQL}"
+        )
+
+        keys = [self._get_dedup_key(flds, mid) for _, flds, mid in rows]
+
+        # Count first so lists are only allocated for keys that actually repeat
+        duplicates: Dict[bytes, List[int]] = {
+            key: [] for key, count in Counter(keys).items() if count > 1
+        }
+        for row, key in zip(rows, keys):
+            group = duplicates.get(key)
+            if group is not None:
+                group.append(row[0])
+
+        return list(duplicates.values())
+
+    def _group_duplicates_by_all_fields(self, ids: str) -> List[List[int]]:
+        """Let SQLite group notes with identical field contents and return only duplicates."""
+        concatenated_groups = mw.col.db.list(
+            f"select group_concat(id) from notes where id in {ids} and {NOTE_HAS_CARDS_SQL}"
+            " group by flds having count(*) > 1"
+        )
+        return [[int(note_id) for note_id in group.split(',')] for group in concatenated_groups]
+
+    def _apply_tag_to_duplicates(
+        self, duplicates: List[List[int]], tag_to_apply: str
+    ) -> Tuple[int, int, int]:
+        """Apply the provided tag to duplicates.
+
+        Returns the number of newly tagged notes, of duplicates that already had the tag,
+        and of undo steps the tagging took.
+        """
+        to_tag: List[int] = []
+
+        for note_ids_list in duplicates:
+            # Keep the oldest note (lowest id) untagged to serve as the canonical entry
+            min_id = min(note_ids_list)
+            to_tag.extend(note_id for note_id in note_ids_list if note_id != min_id)
+
+        if not to_tag:
+            return 0, 0, 0
+
+        # Regular runs stay a single bulk operation, so one Undo reverts them
+        if len(to_tag) <= TAG_BATCHING_THRESHOLD:
+            result = mw.col.tags.bulk_add(to_tag, tag_to_apply)
+            on_op_finished(mw, result, self)
+            # bulk_add only counts notes it changed, i.e. those that didn't have the tag yet
+            return result.count, len(to_tag) - result.count, 1
+
+        # Very large runs are tagged in batches so Anki can show progress between them
+        batches = [to_tag[i:i + TAG_BATCH_SIZE] for i in range(0, len(to_tag), TAG_BATCH_SIZE)]
+        newly_tagged = 0
+        mw.progress.start(max=len(batches), label="Tagging duplicates...")
+        try:
+            for i, batch in enumerate(batches):
+                result = mw.col.tags.bulk_add(batch, tag_to_apply)
+                newly_tagged += result.count
+                # update() resets the maximum unless it is passed again, and doesn't repaint
+                mw.progress.update(value=i + 1, max=len(batches))
+                mw.app.processEvents(QEventLoop.ProcessEventsFlag.ExcludeUserInputEvents)
+        finally:
+            mw.progress.finish()
+
+        on_op_finished(mw, result, self)
+        return newly_tagged, len(to_tag) - newly_tagged, len(batches)
+